@@ -6,20 +6,36 @@ from storage.utils.settings import settings
 def run(
     host: str = settings.uvicorn_host,
     port: int = settings.uvicorn_port,
-    root_path: str = settings.uvicorn_root_path, 
+    root_path: str = settings.uvicorn_root_path,
     proxy_headers: bool = settings.uvicorn_proxy_headers,
+    workers: int = settings.uvicorn_workers,
+    loop: str = "uvloop",
+    http: str = "httptools",
     reload=False
 ):
     """
-    Run the storage app using the uvicron wsgi server. the settings are loaded from the 
+    Run the storage app using the uvicron wsgi server. the settings are loaded from the
     settings submodule, but can be overwritten with directly.
     :param host: host for the server
     :param port: port for the server
     :param root_path: root path for the server
     :param proxy_headers: use proxy headers
+    :param workers: number of worker processes - use more than one to hash concurrent uploads in parallel
+    :param loop: event loop implementation passed to uvicorn
+    :param http: http protocol implementation passed to uvicorn
     :param reload: reload the server on file changes
     """
-    uvicorn.run("storage.app:app", host=host, port=port, root_path=root_path, proxy_headers=proxy_headers, reload=reload)
+    uvicorn.run(
+        "storage.app:app",
+        host=host,
+        port=port,
+        root_path=root_path,
+        proxy_headers=proxy_headers,
+        workers=workers,
+        loop=loop,
+        http=http,
+        reload=reload,
+    )
 
 
 if __name__ == "__main__":
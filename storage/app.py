@@ -1,14 +1,32 @@
+import asyncio
+import hashlib
+
 from fastapi import FastAPI,  Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from functools import lru_cache
 from pathlib import Path
 
 from .__version__ import __version__
 from .routers import upload, info, auth
+from .utils.supabase_client import metadata_insert_worker, warmup, shutdown
+
+# read the upload client example once at import - the file never changes
+# while the app is running
+_CLIENT_TEMPLATE = (Path(__file__).parent / "upload_client_example.py").read_text()
+
+
+@lru_cache(maxsize=32)
+def _render_client_code(scheme: str, host: str, root_path: str) -> bytes:
+    """Build the upload client script for the given server url."""
+    url = f"{scheme}://{host}{root_path}"
+    return _CLIENT_TEMPLATE.replace("http://127.0.0.1:8000/", url).encode()
 
 app = FastAPI(
     title="Deadwood-AI Storage API",
     description="This is the Deadwood-AI Storage API. It is used to manage files uploads for the Deadwood-AI backend.",
     version=__version__,
+    default_response_class=ORJSONResponse,
 )
 
 # add CORS middleware
@@ -29,6 +47,27 @@ app.include_router(upload.router)
 # add the auth rout to the app
 app.include_router(auth.router)
 
+
+@app.on_event("startup")
+async def start_metadata_worker():
+    # flushes queued metadata inserts to supabase in the background
+    app.state.metadata_worker = asyncio.create_task(metadata_insert_worker())
+
+
+@app.on_event("shutdown")
+async def stop_metadata_worker():
+    # flush queued metadata inserts before the process exits - their uploads
+    # were already answered with a 201, so a redeploy must not drop them
+    await shutdown(app.state.metadata_worker)
+
+
+@app.on_event("startup")
+async def warm_first_request():
+    # pay the one-off costs now instead of on the first upload after a
+    # deploy: the sha256 backend dispatch and the TLS handshake to supabase
+    hashlib.sha256(b"warmup").hexdigest()
+    await warmup()
+
 # TODO: not yet sure where to put this route
 @app.get(
     "/upload_code.py",
@@ -47,18 +86,12 @@ def get_code(request: Request):
     ```
 
     """
-    # get the url of the server
+    # get the url of the server and render the client code for it - the
+    # result is cached per (scheme, host, root_path)
     scheme = request.scope.get("scheme")
     host = request.headers.get("host")
     root_path = request.scope.get("root_path")
-    url = f"{scheme}://{host}{root_path}"
-
-    # try to read it first
-    with open(Path(__file__).parent / "upload_client_example.py", "r") as f:
-        code = f.read()
-
-    # replace the localhost url with the actual server url
-    code = code.replace("http://127.0.0.1:8000/", url)
+    code = _render_client_code(scheme, host, root_path)
 
     # create headers for attachement disposition and filename
     headers = {"Content-Disposition": "attachment; filename=upload_client.py"}
@@ -1,4 +1,6 @@
 import platform
+from functools import lru_cache
+
 from fastapi import APIRouter, Request
 from pydantic import BaseModel
 
@@ -10,31 +12,27 @@ class InfoResponse(BaseModel):
     endpoints: list[dict]
 
 
+# the system info never changes while the app is running - platform.platform()
+# in particular can shell out to uname on some distros
+_PYTHON_VERSION = platform.python_version()
+_PLATFORM = platform.platform()
 
-router = APIRouter()
 
-@router.get("/", response_model=InfoResponse)
-def info(request: Request):
-    """
-    Get information about the storage API.
-    """
-    # get the host and root path from the request
-    scheme = request.scope.get("scheme")
-    host = request.headers.get("host")
-    root_path = request.scope.get("root_path")
+@lru_cache(maxsize=16)
+def _build_info(scheme: str, host: str, root_path: str) -> InfoResponse:
+    """Assemble the info response for the given server url."""
     url = f"{scheme}://{host}{root_path}".strip('/')
 
     # create the info about the API server
-    info = dict(
+    return InfoResponse(
         name="Deadwood-AI Storage API.",
         description="This is the Deadwood-AI Storage API. It is used to manage files uploads for the Deadwood-AI backend. If you are not a developer, you may be searching for https://deadtrees.earth",
         system=dict(
-            python_version=platform.python_version(),
-            platform=platform.platform(),
+            python_version=_PYTHON_VERSION,
+            platform=_PLATFORM,
             host=host,
             root_path=root_path,
-            scopes=list(request.scope.keys()),
-            server=request.scope.get("scheme"),
+            server=scheme,
         ),
         endpoints=[
             dict(url=f"{url}/", description="Get information about the storage API."),
@@ -48,4 +46,18 @@ def info(request: Request):
         ],
     )
 
-    return info
+
+router = APIRouter()
+
+@router.get("/", response_model=InfoResponse)
+def info(request: Request):
+    """
+    Get information about the storage API.
+    """
+    # get the host and root path from the request - the response is cached
+    # per (scheme, host, root_path)
+    scheme = request.scope.get("scheme")
+    host = request.headers.get("host")
+    root_path = request.scope.get("root_path")
+
+    return _build_info(scheme, host, root_path)
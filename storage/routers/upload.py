@@ -1,15 +1,26 @@
 from typing import Annotated
-import uuid
+import asyncio
+import os
+import secrets
 import hashlib
+import logging
+import ssl
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, Form, Depends, HTTPException
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.security.oauth2 import OAuth2PasswordBearer
+from pydantic import TypeAdapter, ValidationError
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.parser import ParseFailedException
+from streaming_form_data.targets import BaseTarget, ValueTarget
 
 from ..utils.settings import settings
 from ..utils.metadata_models import PlatformEnum, LicenseEnum, StatusEnum, FileUploadMetadata
-from ..utils.supabase_client import verify_token, use_client
+from ..utils.supabase_client import verify_token, queue_metadata_insert
 
 
 # build a router for the upload endpoint
@@ -18,20 +29,139 @@ router = APIRouter()
 # create the OAuth2 password scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+logger = logging.getLogger(__name__)
 
-@router.post("/upload", status_code=201, response_model=FileUploadMetadata)
+# batch the small chunks coming off the ASGI stream (typically 64 KiB) into
+# 4 MiB writes, so the write syscall count drops by two orders of magnitude
+WRITE_BUFFER_SIZE = 4 << 20
+
+# one shared validator for the form fields, built once instead of
+# re-validating with ad-hoc constructors on every request
+_form_adapter = TypeAdapter(tuple[PlatformEnum, LicenseEnum, datetime])
+
+
+def _sha256():
+    """
+    Return a fresh SHA256 digest from the fastest backend available.
+    The usedforsecurity flag lets OpenSSL pick its hardware-accelerated
+    (SHA-NI) implementation where the CPU supports it.
+    """
+    return hashlib.new("sha256", usedforsecurity=False)
+
+
+def _cpu_has_sha_ni() -> bool:
+    try:
+        cpuinfo = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return False
+    return "sha_ni" in cpuinfo
+
+
+# log once at import which hashing backend the uploads will use, as sha256
+# is the dominant CPU cost for large files
+logger.info(
+    "sha256 backend: %s, SHA-NI %savailable",
+    ssl.OPENSSL_VERSION,
+    "" if _cpu_has_sha_ni() else "not ",
+)
+
+
+class FileUploadTarget(BaseTarget):
+    """
+    Streaming target for the uploaded file part. The multipart body is
+    written straight to the raw upload directory as it arrives, while every
+    chunk is folded into a SHA256 digest, so the file is touched exactly
+    once and never spooled to a temporary file.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.uid: str | None = None
+        self.target_path: Path | None = None
+        self.size = 0
+        self.hash = _sha256()
+        self._buffer = None
+
+    def on_start(self):
+        # a second part named 'file' would silently overwrite the writer while
+        # hash and size keep accumulating across both parts, so the metadata
+        # would describe a file that was never stored - reject it outright
+        if self._buffer is not None:
+            raise HTTPException(status_code=422, detail="Upload contains more than one file part")
+
+        # a file part without a filename cannot be stored - reject it before
+        # anything is written
+        if self.multipart_filename is None:
+            raise HTTPException(status_code=422, detail="File part has no filename")
+
+        # save the file to the raw upload directory - prefix the filename with
+        # a random id and reserve the path atomically. O_EXCL makes the open
+        # fail if the name is already taken, so there is no stat-then-open
+        # race and no separate exists() syscall
+        while True:
+            self.uid = secrets.token_hex(8)
+            self.target_path = settings.raw_upload_path / f"{self.uid}_{self.multipart_filename}"
+            try:
+                fd = os.open(self.target_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                break
+            except FileExistsError:
+                continue
+
+        self._buffer = os.fdopen(fd, "wb", buffering=WRITE_BUFFER_SIZE)
+
+    def on_data_received(self, chunk: bytes):
+        self._buffer.write(chunk)
+        self.hash.update(chunk)
+        self.size += len(chunk)
+
+    def on_finish(self):
+        self._buffer.flush()
+
+        # make the upload durable before the response goes out - fdatasync
+        # flushes the data without the inode metadata journal commit a full
+        # fsync would add
+        if hasattr(os, "fdatasync"):
+            os.fdatasync(self._buffer.fileno())
+
+        # uploads are written once and rarely read back, so tell the kernel
+        # to drop them from the page cache instead of crowding out RAM that
+        # concurrent requests need
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(self._buffer.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+        self._buffer.close()
+
+    def discard(self):
+        """Close the writer and remove whatever was already written, so a
+        failed upload leaves no orphaned file behind."""
+        if self._buffer is not None and not self._buffer.closed:
+            self._buffer.close()
+        if self.target_path is not None:
+            try:
+                os.unlink(self.target_path)
+            except FileNotFoundError:
+                pass
+
+
+@router.post(
+    "/upload",
+    status_code=201,
+    # skip the response-model validation pass on the hot path; the model is
+    # still referenced here so it shows up in the OpenAPI schema
+    response_model=None,
+    responses={201: {"model": FileUploadMetadata}},
+)
 async def upload_file(
-    file: UploadFile, 
-    platform: Annotated[PlatformEnum, Form()],
-    license: Annotated[LicenseEnum, Form()],
-    aquisition_date: Annotated[datetime, Form()],
+    request: Request,
     token: Annotated[str, Depends(oauth2_scheme)]
-) -> FileUploadMetadata:
+) -> ORJSONResponse:
     """
     Upload a file to the server.
 
-    This endpoint expects a single file to be uploaded. The file will be saved to the raw upload directory and
-    the following information about the file will be returned:
+    This endpoint expects a single file to be uploaded as `multipart/form-data`, along
+    with the form fields `platform`, `license` and `aquisition_date`. The file will be
+    saved to the raw upload directory and the following information about the file will
+    be returned:
 
     - filename: the name of the file
     - content_type: the MIME type of the file
@@ -43,8 +173,8 @@ async def upload_file(
     - platform: the platform from which the file was uploaded
 
 
-    To send the file use the `multipart/form-data` content type. The file should be sent as the value of a field
-    named `file`. For example, using HTML forms like this:
+    The file should be sent as the value of a field named `file`. For example, using
+    HTML forms like this:
 
     ```html
     <form action="/upload" method="post" enctype="multipart/form-data">
@@ -65,40 +195,83 @@ async def upload_file(
 
     """
     # first thing we do is verify the token
-    user_id = verify_token(token)
+    user_id = await verify_token(token)
 
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    # create a UUID for this file
-    uid = str(uuid.uuid4())
-    # save the file to the raw upload directory - add a UUID to the filename
-    target_path = settings.raw_upload_path / f"{uid}_{file.filename}"
+    # set up the streaming parser - the file bytes go straight to disk and
+    # into the digest, the small form fields are collected in memory
+    file_target = FileUploadTarget()
+    platform_target = ValueTarget()
+    license_target = ValueTarget()
+    aquisition_date_target = ValueTarget()
 
-    # check if the file already exists
-    if target_path.exists():
-        raise ValueError(f"file already exists: {file.filename}")
+    # everything from parsing to validation runs inside one try block: if any
+    # of it fails (or the client disconnects), the reserved file is closed and
+    # unlinked again, so failed uploads never leave artifacts behind
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register("file", file_target)
+        parser.register("platform", platform_target)
+        parser.register("license", license_target)
+        parser.register("aquisition_date", aquisition_date_target)
 
-    # # write the file to the target path
-    t1 = time.time()
-    with target_path.open("wb") as buffer:
-        buffer.write(await file.read())
+        # feed the raw body into the parser on a single worker thread, while the
+        # event loop only awaits socket I/O. Parsing, hashing and writing chunk N
+        # runs in parallel with receiving chunk N + 1.
+        t1 = time.time()
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            parsed = None
+            async for chunk in request.stream():
+                if parsed is not None:
+                    await parsed
+                parsed = loop.run_in_executor(executor, parser.data_received, chunk)
+            if parsed is not None:
+                await parsed
+        t2 = time.time()
 
-    # calculate the SHA256 hash of the file
-    with target_path.open("rb") as f:
-        sha256 = hashlib.sha256(f.read()).hexdigest()
-    t2 = time.time()
+        if file_target.target_path is None:
+            raise HTTPException(status_code=422, detail="No file was uploaded")
+
+        # an unterminated file part never had finish() called, so the buffered
+        # tail was not flushed and synced - the upload is incomplete
+        if not file_target._finished:
+            raise HTTPException(status_code=422, detail="File part is incomplete - missing closing boundary")
+
+        # validate the form fields
+        try:
+            platform, license, aquisition_date = _form_adapter.validate_python((
+                platform_target.value.decode(),
+                license_target.value.decode(),
+                aquisition_date_target.value.decode(),
+            ))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=422, detail="Form fields must be utf-8 encoded")
+    except ParseFailedException as e:
+        file_target.discard()
+        raise HTTPException(status_code=422, detail=f"Could not parse the multipart body: {e}")
+    except BaseException:
+        # covers the HTTPExceptions above as well as client disconnects and
+        # request cancellation
+        file_target.discard()
+        raise
 
     # finally return some info about the uploaded file
     metadata = FileUploadMetadata(
         user_id=user_id,
-        file_name=file.filename,
-        content_type=file.content_type,
-        file_size=file.size,
-        raw_path=str(target_path),
+        file_name=file_target.multipart_filename,
+        # the Content-Type header of a part is optional in multipart, so fall
+        # back to the generic binary type instead of failing the upload
+        content_type=file_target.multipart_content_type or "application/octet-stream",
+        file_size=file_target.size,
+        raw_path=str(file_target.target_path),
         copy_time=t2 - t1,
-        uuid=uid,
-        sha256=sha256,
+        uuid=file_target.uid,
+        sha256=file_target.hash.hexdigest(),
         platform=platform,
         license=license,
         upload_date=datetime.utcnow(),
@@ -106,18 +279,14 @@ async def upload_file(
         status=StatusEnum.pending
     )
 
-    # upload the metadata to supabase
-    with use_client(token) as client:
-        try:
-            client.table(settings.metadata_table).insert(metadata.model_dump()).execute()
-        except Exception as e:
-            print(str(e))
-            raise HTTPException(status_code=500, detail=str(e))
-    
+    # queue the metadata for supabase - the background worker flushes the
+    # queue in batches, so the response does not wait for the round-trip
+    await queue_metadata_insert(token, metadata.model_dump(mode="json"))
+
     # save the metadata to a json file of same name
-    # metadata_path = settings.raw_upload_path / f"{uid}_{file.filename}.json"
-    # with metadata_path.open("w") as f:
-    #     f.write(metadata.model_dump_json(indent=4))
+    # metadata_path = file_target.target_path.with_suffix(".json")
+    # metadata_path.write_bytes(orjson.dumps(metadata.model_dump(mode="json"), option=orjson.OPT_INDENT_2))
 
-    # return the metadata
-    return metadata
+    # return the metadata directly, without a second validation pass through
+    # FastAPI's response model machinery
+    return ORJSONResponse(content=metadata.model_dump(mode="json"), status_code=201)
@@ -0,0 +1,47 @@
+from enum import Enum
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class PlatformEnum(str, Enum):
+    """Platform from which the data was acquired."""
+    drone = "drone"
+    airborne = "airborne"
+    satellite = "satellite"
+
+
+class LicenseEnum(str, Enum):
+    """License under which the data is published."""
+    cc_by = "cc-by"
+    cc_by_sa = "cc-by-sa"
+    cc_by_nc_sa = "cc-by-nc-sa"
+    mit = "mit"
+
+
+class StatusEnum(str, Enum):
+    """Processing status of an uploaded file."""
+    pending = "pending"
+    processing = "processing"
+    errored = "errored"
+    processed = "processed"
+
+
+class FileUploadMetadata(BaseModel):
+    """
+    Metadata about a single uploaded file, as stored in the metadata table
+    and returned by the upload endpoint.
+    """
+    user_id: str
+    file_name: str
+    content_type: str
+    file_size: int
+    raw_path: str
+    copy_time: float
+    uuid: str
+    sha256: str
+    platform: PlatformEnum
+    license: LicenseEnum
+    upload_date: datetime
+    aquisition_date: datetime
+    status: StatusEnum
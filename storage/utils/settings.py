@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from pydantic_settings import BaseSettings
+from dotenv import load_dotenv
+
+# load an .env file if it exists
+load_dotenv()
+
+# base directory of the package itself
+BASE = Path(__file__).parent.parent.parent
+
+
+class Settings(BaseSettings):
+    """
+    Settings for the storage app. All settings can be overwritten by
+    environment variables or an .env file in the working directory.
+    """
+    # base directory for all file storage
+    base_dir: str = "data"
+
+    # subdirectory for raw uploads
+    raw_upload_dir: str = "raw"
+
+    # supabase settings for authentication and metadata
+    supabase_url: str = ""
+    supabase_key: str = ""
+    metadata_table: str = "upload_files"
+
+    # uvicorn settings
+    uvicorn_host: str = "127.0.0.1"
+    uvicorn_port: int = 8000
+    uvicorn_root_path: str = ""
+    uvicorn_proxy_headers: bool = True
+    uvicorn_workers: int = 1
+
+    @property
+    def base_path(self) -> Path:
+        path = Path(self.base_dir)
+        if not path.is_absolute():
+            path = BASE / path
+        return path
+
+    @property
+    def raw_upload_path(self) -> Path:
+        path = self.base_path / self.raw_upload_dir
+
+        # create the directory if it does not exist
+        path.mkdir(parents=True, exist_ok=True)
+
+        return path
+
+
+settings = Settings()
@@ -0,0 +1,158 @@
+import asyncio
+from contextlib import contextmanager
+
+import httpx
+from cachetools import TTLCache
+from supabase import create_client, Client
+
+from .settings import settings
+
+# async http client for token verification, so the hot path of /upload
+# never runs a blocking https request on the event loop
+_auth_http = httpx.AsyncClient(
+    base_url=settings.supabase_url,
+    headers={"apikey": settings.supabase_key},
+    timeout=10.0,
+)
+
+# cache verified tokens for a few minutes, so repeated uploads from the same
+# client skip the round-trip to supabase entirely
+_token_cache: TTLCache = TTLCache(maxsize=4096, ttl=300)
+
+# metadata records waiting to be inserted, as (access_token, record) tuples.
+# uploads enqueue here and return immediately; the worker below flushes the
+# queue in batches so the https round-trip is off the critical path
+_insert_queue: asyncio.Queue = asyncio.Queue()
+
+
+def login(email: str, password: str):
+    """
+    Login to supabase with the given email and password and return the
+    auth response, including the access token. The client is scoped to
+    this call, as sign_in_with_password stores the user's session (and
+    its auto-refresh machinery) on the client it runs on.
+    """
+    client: Client = create_client(settings.supabase_url, settings.supabase_key)
+    return client.auth.sign_in_with_password({"email": email, "password": password})
+
+
+async def verify_token(jwt: str) -> str | bool:
+    """
+    Verify the given JWT token with supabase. Returns the user id if the
+    token is valid, otherwise False. Valid tokens are cached for a few
+    minutes, so only the first request per token hits supabase.
+    """
+    user_id = _token_cache.get(jwt)
+    if user_id is not None:
+        return user_id
+
+    try:
+        response = await _auth_http.get("/auth/v1/user", headers={"Authorization": f"Bearer {jwt}"})
+    except httpx.HTTPError:
+        return False
+    if response.status_code != 200:
+        return False
+
+    user_id = response.json()["id"]
+    _token_cache[jwt] = user_id
+    return user_id
+
+
+async def warmup():
+    """
+    Open the https connection to supabase once at startup, so the first
+    authenticated request does not pay for the TLS handshake.
+    """
+    try:
+        await _auth_http.get("/auth/v1/health")
+    except httpx.HTTPError:
+        pass
+
+
+async def queue_metadata_insert(access_token: str, record: dict):
+    """
+    Queue a metadata record for insertion into the metadata table. The
+    record is written by the background worker, so this returns without
+    waiting for the https round-trip.
+    """
+    await _insert_queue.put((access_token, record))
+
+
+def _insert_batch(access_token: str, records: list[dict]):
+    with use_client(access_token) as client:
+        client.table(settings.metadata_table).insert(records).execute()
+
+
+def _drain_queued() -> dict:
+    """Pop everything currently in the insert queue, grouped by access
+    token so row level security still applies per user."""
+    batches: dict = {}
+    while True:
+        try:
+            access_token, record = _insert_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        batches.setdefault(access_token, []).append(record)
+    return batches
+
+
+async def _flush_batches(batches: dict):
+    for access_token, records in batches.items():
+        try:
+            await asyncio.to_thread(_insert_batch, access_token, records)
+        except Exception as e:
+            print(str(e))
+
+
+async def metadata_insert_worker():
+    """
+    Drain the metadata insert queue forever. Records queued while an
+    insert is in flight are flushed together in one bulk insert per
+    access token, and the sync SDK call runs on a worker thread so the
+    event loop is never blocked.
+    """
+    while True:
+        access_token, record = await _insert_queue.get()
+
+        batches = _drain_queued()
+        batches.setdefault(access_token, []).insert(0, record)
+
+        await _flush_batches(batches)
+
+
+async def shutdown(worker_task: asyncio.Task | None = None):
+    """
+    Flush any metadata inserts still queued, stop the worker task and
+    close the shared auth http client. The queued records were already
+    acknowledged with a 201, so they must reach supabase before the
+    process exits.
+    """
+    await _flush_batches(_drain_queued())
+
+    if worker_task is not None:
+        worker_task.cancel()
+        try:
+            await worker_task
+        except asyncio.CancelledError:
+            pass
+
+    await _auth_http.aclose()
+
+
+@contextmanager
+def use_client(access_token: str | None = None):
+    """
+    Yield a supabase client. If an access token is given, the client
+    will use it for all requests, so that row level security applies
+    for the user owning the token.
+    """
+    client: Client = create_client(settings.supabase_url, settings.supabase_key)
+
+    # authorize the postgrest requests with the user's token
+    if access_token is not None:
+        client.postgrest.auth(access_token)
+
+    try:
+        yield client
+    finally:
+        client.auth.sign_out()